@@ -1,82 +1,356 @@
+import json
+import time
+
 import streamlit as st
 import gspread
+import numpy as np
 import pandas as pd
-import plotly.express as px
 from google.oauth2.service_account import Credentials
-from st_aggrid import AgGrid, GridOptionsBuilder
-from st_aggrid import GridUpdateMode
-from streamlit_plotly_events import plotly_events  # Import event capture function
+from gspread.exceptions import APIError
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
-import streamlit as st
-import gspread
-import json
-from google.oauth2.service_account import Credentials
+# plotly and st_aggrid are imported inside the page branches (and helpers) that use them,
+# so a rerun only loads the chart/grid modules the selected page needs
+
+# Streamlit App (page config must be the first Streamlit command)
+st.set_page_config(layout="wide")
 
 # Define Google API scopes
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
 
-# Load credentials
-try:
-    # 1. Try Streamlit Secrets (for cloud)
-    service_account_info = json.loads(st.secrets["gcp_service_account"])
-    creds = Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
-except:
-    # 2. Fallback to local file (for development)
+
+@st.cache_resource(show_spinner=False)
+def load_credentials():
+    """Authorize a gspread client from Streamlit secrets (cloud) or service-account.json (local)."""
     try:
+        # 1. Try Streamlit Secrets (for cloud)
+        service_account_info = json.loads(st.secrets["gcp_service_account"])
+        creds = Credentials.from_service_account_info(service_account_info, scopes=SCOPES)
+    except (KeyError, FileNotFoundError, json.JSONDecodeError):
+        # 2. Fallback to local file (for development)
         creds = Credentials.from_service_account_file("service-account.json", scopes=SCOPES)
-    except Exception as e:
+    return gspread.authorize(creds)
+
+
+# Load credentials once per process (cache_resource) and keep the client on the session
+if 'gc' not in st.session_state:
+    try:
+        st.session_state['gc'] = load_credentials()
+    except (FileNotFoundError, ValueError):
         st.error("Failed to load Google credentials. Check secrets or local file.")
         st.stop()
 
-# Authorize gspread
-gc = gspread.authorize(creds)
-
 # Now use gc to access Sheets
+gc = st.session_state['gc']
 
 
-spreadsheet = gc.open_by_key("1DEsQQMwkcGaHIUpirSLoFsM0HSSq1nlYB9PynDW-txQ")
+COLOR_MAP = {'Present': 'mediumpurple', 'Absent': 'papayawhip'}
 
-# Access the "Primary Table" worksheet
-worksheet = spreadsheet.worksheet("Main")
+MAIN_SHEET_KEY = "1DEsQQMwkcGaHIUpirSLoFsM0HSSq1nlYB9PynDW-txQ"
+DAILY_SHEET_KEY = "1J2XQPhOc2OqDcjjg_9-WLA7RbtveaLI5ddK91I6cwlw"
 
-# Convert the worksheet data to a Pandas DataFrame
-data = worksheet.get_all_records()
-df = pd.DataFrame(data)
 
-# Access the "pdftosheets" worksheet for monthly data
-worksheet_monthly = spreadsheet.worksheet("pdftosheet")
-data_monthly = worksheet_monthly.get_all_records()
-df_monthly = pd.DataFrame(data_monthly)
+def values_to_dataframe(values):
+    """Build a DataFrame from a raw 2D values list, using the first row as header."""
+    if not values:
+        return pd.DataFrame()
+    header = [c.strip() for c in values[0]]
+    width = len(header)
+    # The values API drops trailing empty cells, so pad/trim rows to the header width
+    rows = [row[:width] + [''] * (width - len(row)) for row in values[1:]]
+    # Arrow-backed strings: one contiguous buffer per column instead of a PyObject per cell
+    return pd.DataFrame(rows, columns=header).convert_dtypes(dtype_backend='pyarrow')
 
-# Ensure numeric columns are numeric
-df['SUM of Payable Days'] = pd.to_numeric(df['SUM of Payable Days'], errors='coerce')
-df['Updated Absent Days'] = pd.to_numeric(df['Updated Absent Days'], errors='coerce')
-df['Extension Days '] = pd.to_numeric(df['Extension Days '], errors='coerce')
-df['Year '] = pd.to_numeric(df['Year '], errors='coerce')
 
-# Ensure numeric columns in monthly data
-df_monthly['Payable Days'] = pd.to_numeric(df_monthly['Payable Days'], errors='coerce')
-df_monthly['Absent Days'] = pd.to_numeric(df_monthly['Absent Days'], errors='coerce')
-df_monthly['Days in Month'] = pd.to_numeric(df_monthly['Days in Month'], errors='coerce')
+def is_transient_api_error(error):
+    """True for Sheets API errors worth retrying: 429 rate limits and 5xx server errors."""
+    if not isinstance(error, APIError):
+        return False
+    status = error.response.status_code
+    return status == 429 or status >= 500
 
-# Filter rows where "Name" has characters
-df = df[df['Name'].str.strip().astype(bool)]
 
-df['Defaulter'] = df.apply(
-    lambda row: 'Defaulter' if (
-        pd.notna(row['Updated Absent Days']) and  # Ensure Updated Absent Days is present
-        (
-            (pd.isna(row['Year ']) and pd.to_numeric(row['Updated Absent Days'], errors='coerce') > 24) or
-            (pd.notna(row['Year ']) and row['Year '] < 2023 and pd.to_numeric(row['Updated Absent Days'], errors='coerce') > 156) or
-            (pd.notna(row['Year ']) and row['Year '] >= 2023 and pd.to_numeric(row['Updated Absent Days'], errors='coerce') > 24)
-        )
-    ) else 'Non-Defaulter',
-    axis=1
+@retry(
+    retry=retry_if_exception(is_transient_api_error),  # 403/404 etc. fail immediately
+    wait=wait_exponential(min=0.2, max=2),
+    stop=stop_after_attempt(3),
+    reraise=True,
 )
+def call_api(func, *args, **kwargs):
+    """Make one Google API call, retrying rate limits and server errors with backoff."""
+    return func(*args, **kwargs)
+
+
+@st.cache_resource(show_spinner=False)
+def get_spreadsheet(_gc, sheet_key):
+    # Open each spreadsheet once per process; open_by_key costs a metadata round-trip
+    return call_api(_gc.open_by_key, sheet_key)
+
+
+def sheet_range(worksheet_name):
+    """A1 range covering a whole worksheet, quoted for the values API."""
+    return "'{}'".format(worksheet_name.replace("'", "''"))
+
+
+def load_sheets(_gc, sheet_key, worksheet_names):
+    # Fetch several worksheets in one values.batchGet round-trip on the cached spreadsheet
+    # handle; no per-load open_by_key or worksheet metadata fetch, and no get_all_records
+    # per-row dict materialization
+    if not worksheet_names:
+        return {}
+    ranges = [sheet_range(name) for name in worksheet_names]
+    spreadsheet = get_spreadsheet(_gc, sheet_key)
+    value_ranges = call_api(spreadsheet.values_batch_get, ranges=ranges).get('valueRanges', [])
+    return {
+        name: values_to_dataframe(value_range.get('values', []))
+        for name, value_range in zip(worksheet_names, value_ranges)
+    }
+
+
+def load_daily_data(_gc, sheet_key):
+    # Every month sheet comes back in one request instead of one call per selection
+    worksheets = call_api(get_spreadsheet(_gc, sheet_key).worksheets)
+    return load_sheets(_gc, sheet_key, [ws.title for ws in worksheets if ws.title != "Sheet1"])
+
+
+def whole_numbers_as_int(col):
+    """Downcast a NaN-free float column to int64 when every value is whole (e.g. day counts)."""
+    return col.astype('int64') if col.mod(1).eq(0).all() else col
+
+
+def clean_frame(df, numeric_cols, text_cols, required_cols, fill_cols=(), category_cols=()):
+    """Coerce numeric/text columns in one assign pass and drop rows with a blank required column.
+
+    Low-cardinality text columns listed in ``category_cols`` are stored as ``category`` so
+    groupby/value_counts hash small integer codes instead of Python strings.
+    """
+    # On Arrow string input to_numeric returns double[pyarrow] holding NaN *values* that fillna
+    # ignores; casting to NumPy float64 turns them (and any nulls) into fillable NaN
+    num_map = {c: pd.to_numeric(df[c], errors='coerce').astype('float64') for c in numeric_cols if c in df.columns}
+    num_map.update({c: whole_numbers_as_int(num_map[c].fillna(0)) for c in fill_cols if c in num_map})
+    txt_map = {c: df[c].astype(str).str.strip() for c in text_cols if c in df.columns}
+    df = df.assign(**num_map, **txt_map)
+
+    # One boolean mask instead of a row-drop per column
+    masks = [df[c].ne('nan') & df[c].ne('') for c in required_cols if c in df.columns]
+    if masks:
+        df = df[np.logical_and.reduce(masks)]
+    return df.astype({c: 'category' for c in category_cols if c in df.columns})
+
+
+def clean_main_data(df):
+    """Coerce numeric columns, drop unnamed rows and flag defaulters in the "Main" sheet."""
+    df = clean_frame(
+        df,
+        numeric_cols=['SUM of Payable Days', 'Updated Absent Days', 'Extension Days', 'Year'],
+        text_cols=['Name', 'Transfer case'],
+        required_cols=['Name'],
+        category_cols=['Name', 'Transfer case'],
+        # 'Year' keeps its NaN: a missing year selects the post-2023 absence limit below
+        fill_cols=['SUM of Payable Days', 'Updated Absent Days', 'Extension Days'],
+    )
+
+    # Defaulter: more than 156 absent days before 2023, more than 24 from 2023 (or no year)
+    absent_limit = np.where(df['Year'].lt(2023), 156, 24)
+    defaulter = np.where(df['Updated Absent Days'].gt(absent_limit), 'Defaulter', 'Non-Defaulter')
+    df = df.assign(Defaulter=pd.Categorical(defaulter, categories=['Defaulter', 'Non-Defaulter']))
+    return df
+
+
+def clean_monthly_data(df):
+    """Coerce the numeric and text columns of the "pdftosheet" monthly sheet."""
+    numeric_cols = ['Payable Days', 'Absent Days', 'Days in Month', 'Salary']
+    return clean_frame(
+        df,
+        numeric_cols=numeric_cols,
+        text_cols=['Name', 'Month'],
+        required_cols=['Name'],
+        fill_cols=numeric_cols,
+        category_cols=['Name', 'Month'],
+    )
+
+
+def convert_to_hours(hours):
+    """Convert a Hours Worked column (numbers, HH:MM or HH:MM:SS strings) to float hours."""
+    hours_str = hours.astype(str).str.strip()
+
+    # Plain numbers (including numeric strings like "8.5") convert directly
+    numeric_hours = pd.to_numeric(hours_str, errors='coerce')
+
+    # Time strings: take the first entry if there are several, then split HH:MM[:SS]
+    clock = hours_str.str.split().str[0].str.extract(
+        r'^(\d+(?:\.\d+)?):(\d+(?:\.\d+)?)(?::(\d+(?:\.\d+)?))?$'
+    ).astype(float)
+    clock_hours = clock[0] + clock[1] / 60 + clock[2].fillna(0) / 3600
+
+    # If all else fails, use 0
+    # Stored as float64; typed_array narrows to float32 only when building the plot
+    return numeric_hours.fillna(clock_hours).fillna(0.0).astype('float64')
+
+
+def clean_daily_data(df):
+    """Parse dates and convert Hours Worked to numeric hours for one daily month sheet."""
+    # Convert date column to datetime and sort by it, so date ranges can be binary-searched
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'].astype(str), errors='coerce', dayfirst=True)  # NumPy datetime64
+        df = df.sort_values('Date', kind='stable').reset_index(drop=True)
+
+    # Clean and process Hours Worked column - convert to numeric hours
+    if 'Hours Worked' in df.columns:
+        df['Hours Worked'] = convert_to_hours(df['Hours Worked'])
+
+    # Low-cardinality text columns as categoricals for cheap filtering and counting
+    text_cols = [c for c in ['Staff Name', 'Attendance'] if c in df.columns]
+    df = df.assign(**{c: df[c].astype(str).str.strip().astype('category') for c in text_cols})
+    return df
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_sheet_revision(_gc, sheet_key):
+    # One cheap Drive metadata call; the cleaned-frame caches below are keyed on it
+    try:
+        response = call_api(
+            _gc.request,
+            "get",
+            f"{DRIVE_FILES_API_V3_URL}/{sheet_key}",
+            params={"fields": "modifiedTime", "supportsAllDrives": True},
+        )
+        return response.json()["modifiedTime"]
+    except APIError:
+        # Drive unavailable (API not enabled, or still failing after retries): fall back
+        # to an hourly key so the dashboard still renders with TTL-style freshness
+        return f"hour-{int(time.time() // 3600)}"
+
+
+def row_index(frame, column):
+    """Map each category of ``column`` to its (ascending) row positions, built in one sort pass."""
+    codes = frame[column].cat.codes.to_numpy()
+    categories = frame[column].cat.categories
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+    return {name: order[bounds[i]:bounds[i + 1]] for i, name in enumerate(categories)}
+
+
+def rows_for(index, key):
+    """Row positions for ``key`` in a row_index lookup (empty if the value never occurs)."""
+    return index.get(key, np.empty(0, dtype=np.intp))
+
+
+# Cleaned frames (and the row lookups for the sidebar filters) are cached per sheet revision,
+# so data is re-fetched only after an actual edit and the cache key is a cheap string
+@st.cache_data(max_entries=4)
+def get_main_frames(_gc, sheet_key, revision):
+    # "Main" and "pdftosheet" share one batched request rather than two sequential calls
+    frames = load_sheets(_gc, sheet_key, ["Main", "pdftosheet"])
+    df = clean_main_data(frames["Main"])
+    df_monthly = clean_monthly_data(frames["pdftosheet"])
+    salary_by_month = monthly_salary_agg(df_monthly)
+    return {
+        'df': df,
+        'df_monthly': df_monthly,
+        'name_rows': row_index(df, 'Name'),
+        'monthly_name_rows': row_index(df_monthly, 'Name'),
+        'month_rows': row_index(df_monthly, 'Month'),
+        'article_agg': main_agg(df),
+        'extensions': extension_view(df),
+        'salary_by_month': salary_by_month,
+        'salary_pivot': salary_trend_pivot(salary_by_month),
+        'opts': option_lists(df, df_monthly),
+    }
+
+
+@st.cache_data(max_entries=4)
+def get_daily_frames(_gc, sheet_key, revision):
+    frames = {name: clean_daily_data(frame) for name, frame in load_daily_data(_gc, sheet_key).items()}
+    return {
+        'frames': frames,
+        'staff_rows': {
+            name: row_index(frame, 'Staff Name') if 'Staff Name' in frame.columns else {}
+            for name, frame in frames.items()
+        },
+    }
+
+
+def for_px(frame):
+    """Drop unused categories so plotly.express only groups by values that actually occur."""
+    cat_cols = frame.select_dtypes('category').columns
+    return frame.assign(**{c: frame[c].cat.remove_unused_categories() for c in cat_cols})
+
+
+def typed_array(values, dtype=np.float32):
+    """Contiguous typed array for a trace; Plotly serialises these as compact binary blocks."""
+    return np.ascontiguousarray(values, dtype=dtype)
+
+
+def grouped_bar_figure(names, traces, title, xaxis_title, yaxis_title):
+    """Grouped bar chart from raw column arrays; ``traces`` is a list of (label, values, color)."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(layout=dict(barmode='group', title=title))
+    x = names.astype(str).to_numpy()
+    for label, values, color in traces:
+        fig.add_trace(go.Bar(x=x, y=typed_array(values), name=label, marker_color=color))
+    fig.update_layout(xaxis_title=xaxis_title, yaxis_title=yaxis_title)
+    return fig
+
+
+def build_grid_options(frame):
+    """Paged, virtualised AgGrid options with filter/sort/resize on every column (community build)."""
+    from st_aggrid import GridOptionsBuilder
+
+    gb = GridOptionsBuilder.from_dataframe(frame)
+    gb.configure_pagination(paginationAutoPageSize=True)  # Only render one page of rows at a time
+    gb.configure_default_column(
+        filter=True,  # Enable filters
+        sortable=True,  # Enable sorting
+        resizable=True,  # Allow column resizing
+        editable=False  # Make the table non-editable
+    )
+    gb.configure_grid_options(domLayout='normal', rowBuffer=20, suppressColumnVirtualisation=False)
+    return gb.build()
+
+
+# Full-frame aggregates, built once per sheet revision in get_main_frames and sliced per filter
+def main_agg(df):
+    return df.groupby('Name', observed=True, as_index=False).agg({
+        'SUM of Payable Days': 'sum',
+        'Updated Absent Days': 'sum',
+        'Defaulter': 'first',
+    })
+
+
+def extension_view(df):
+    # Rows with Extension Days > 0, sorted descending once for the funnel chart
+    return df[df['Extension Days'].gt(0)].sort_values('Extension Days', ascending=False)
+
+
+def monthly_salary_agg(df_monthly):
+    return df_monthly.groupby(['Month', 'Name'], observed=True, as_index=False)['Salary'].sum()
+
+
+def salary_trend_pivot(salary_by_month):
+    # Month x Name salary table: one column per trend line, no groupby at plot time
+    salary = salary_by_month.astype({'Month': str, 'Name': str})
+    return salary.pivot(index='Month', columns='Name', values='Salary')
+
+
+def option_lists(main_df, monthly_df):
+    # Sidebar dropdown options shared by the pages (categories are already sorted)
+    return {
+        'articles': ["All"] + main_df['Name'].cat.categories.tolist(),
+        'months': ["All"] + monthly_df['Month'].cat.categories.tolist(),
+    }
+
+
+# Load the cleaned "Main" and "pdftosheet" (monthly) worksheets
+main_revision = get_sheet_revision(gc, MAIN_SHEET_KEY)
+main_data = get_main_frames(gc, MAIN_SHEET_KEY, main_revision)
+df, df_monthly = main_data['df'], main_data['df_monthly']
+opts = main_data['opts']
 
 
 # Streamlit App
-st.set_page_config(layout="wide")
 st.title("DRC Attendance Dashboard")
 
 # Sidebar for Navigation
@@ -85,35 +359,36 @@ page_selection = st.sidebar.radio("Go to", ["Main Dashboard", "Monthly Data", "I
 
 
 if page_selection == "Individual Dashboard":
+    import plotly.express as px
+
     st.sidebar.title("Filter Options")
-    article_list = ["All"] + df['Name'].unique().tolist()
-    selected_article = st.sidebar.selectbox("Select Article Name", article_list)
+    selected_article = st.sidebar.selectbox("Select Article Name", opts['articles'])
     
-    month_list = ["All"] + df_monthly['Month'].unique().tolist()
-    selected_month = st.sidebar.selectbox("Select Month", month_list)
+    selected_month = st.sidebar.selectbox("Select Month", opts['months'])
     
+    # Dict lookups into precomputed row positions instead of scanning the columns
     if selected_article == "All":
-        filtered_df = df
-        filtered_monthly_df = df_monthly
+        monthly_rows = None
     else:
-        filtered_df = df[df['Name'] == selected_article]
-        filtered_monthly_df = df_monthly[df_monthly['Name'] == selected_article]
+        monthly_rows = rows_for(main_data['monthly_name_rows'], selected_article)
     
     if selected_month != "All":
-        filtered_monthly_df = filtered_monthly_df[filtered_monthly_df['Month'] == selected_month]
+        month_rows = rows_for(main_data['month_rows'], selected_month)
+        monthly_rows = month_rows if monthly_rows is None else np.intersect1d(monthly_rows, month_rows)
+    
+    filtered_monthly_df = df_monthly if monthly_rows is None else df_monthly.iloc[monthly_rows]
     
     st.subheader(f"Attendance Breakdown for {selected_article} in {selected_month if selected_month != 'All' else 'All Months'}")
     
 
-    # Prepare data for pie chart
+    # Prepare data for pie chart: one reduction per column, remainder floored at 0
+    payable_days = filtered_monthly_df['Payable Days'].to_numpy().sum()
+    absent_days = filtered_monthly_df['Absent Days'].to_numpy().sum()
+    half_days = max(filtered_monthly_df['Days in Month'].to_numpy().sum() - payable_days - absent_days, 0)
     pie_data = {
         'Category': ['Payable Days', 'Absent Days', 'Half Day'],
-        'Count': [
-            filtered_monthly_df['Payable Days'].sum(),
-            filtered_monthly_df['Absent Days'].sum(),
-            filtered_monthly_df['Days in Month'].sum() - (filtered_monthly_df['Payable Days'].sum() + filtered_monthly_df['Absent Days'].sum())
-            ]
-            }
+        'Count': [payable_days, absent_days, half_days]
+    }
             
     pie_df = pd.DataFrame(pie_data)
 
@@ -130,34 +405,39 @@ if page_selection == "Individual Dashboard":
     st.plotly_chart(pie_chart, use_container_width=True)
 
     
-    bar_chart = px.bar(
-        filtered_monthly_df,
-        x='Name',
-        y=['Payable Days', 'Absent Days'],
-        barmode='group',
-        labels={'Name': 'Article Name', 'value': 'Days'},
-        color_discrete_map={'Payable Days': 'mediumpurple','Absent Days': 'papayawhip'},
-        title=f"Payable vs Absent Days for {selected_article}"
+    bar_chart = grouped_bar_figure(
+        filtered_monthly_df['Name'],
+        [
+            ('Payable Days', filtered_monthly_df['Payable Days'], COLOR_MAP['Present']),
+            ('Absent Days', filtered_monthly_df['Absent Days'], COLOR_MAP['Absent']),
+        ],
+        title=f"Payable vs Absent Days for {selected_article}",
+        xaxis_title='Article Name',
+        yaxis_title='Days'
     )
-    bar_chart.for_each_trace(lambda t: t.update(name='Payable Days' if 'Payable Days' in t.name else 'Absent Days'))
     st.plotly_chart(bar_chart, use_container_width=True)
 
 if page_selection == "Main Dashboard":
+    import plotly.express as px
+    from st_aggrid import AgGrid, GridUpdateMode
+
     # Sidebar for Article Name Selection
     st.sidebar.title("Filter Options")
-    article_list = ["All"] + df['Name'].unique().tolist()
-    selected_article = st.sidebar.selectbox("Select Article Name", article_list)
+    selected_article = st.sidebar.selectbox("Select Article Name", opts['articles'])
 
     # Filter data based on selected article name
+    article_agg = main_data['article_agg']
     if selected_article == "All":
         filtered_df = df
+        filtered_agg = article_agg
     else:
-        filtered_df = df[df['Name'] == selected_article]
+        filtered_df = df.iloc[rows_for(main_data['name_rows'], selected_article)]
+        filtered_agg = article_agg.loc[article_agg['Name'] == selected_article]
 
     # Display KPIs for selected article
     if selected_article != "All":
-        total_present_days = filtered_df['SUM of Payable Days'].sum()
-        total_absent_days = filtered_df['Updated Absent Days'].sum()
+        total_present_days = filtered_agg['SUM of Payable Days'].sum()
+        total_absent_days = filtered_agg['Updated Absent Days'].sum()
 
         st.subheader(f"KPIs for {selected_article}")
         st.metric(label="Total Present Days", value=total_present_days)
@@ -165,39 +445,23 @@ if page_selection == "Main Dashboard":
 
     # Combined Bar Chart: Present vs Absent of each Article
     st.subheader("Combined Bar Chart: Present vs Absent of each Article")
-    present_absent_chart = filtered_df.groupby('Name')[['SUM of Payable Days', 'Updated Absent Days']].sum().reset_index()
-    fig1 = px.bar(
-        present_absent_chart,
-        x='Name',
-        y=['SUM of Payable Days', 'Updated Absent Days'],
-        barmode='group',
-        labels={'Name': 'Name', 'value': 'Count'},
-        color_discrete_map={'SUM of Payable Days': 'mediumpurple','Updated Absent Days': 'papayawhip'},
-        title="Combined Bar Chart: Present vs Absent of each Article"
+    fig1 = grouped_bar_figure(
+        filtered_agg['Name'],
+        [
+            ('Present Days', filtered_agg['SUM of Payable Days'], COLOR_MAP['Present']),
+            ('Absent Days', filtered_agg['Updated Absent Days'], COLOR_MAP['Absent']),
+        ],
+        title="Combined Bar Chart: Present vs Absent of each Article",
+        xaxis_title='Name',
+        yaxis_title='Count'
     )
 
-    # Update the legend names to reflect the correct labels
-    fig1.for_each_trace(lambda t: t.update(name='Present Days' if 'SUM of Payable Days' in t.name else 'Absent Days'))
-
     st.plotly_chart(fig1, use_container_width=True)
 
-    # Convert 'Updated Absent Days ' to numeric to avoid TypeError
-    filtered_df['Updated Absent Days'] = pd.to_numeric(filtered_df['Updated Absent Days'], errors='coerce')
-
-    # Apply defaulter logic
-    filtered_df['Defaulter'] = filtered_df.apply(
-        lambda row: 'Non-Defaulter' if (
-            (pd.notna(row['Year ']) and row['Year '] < 2023 and row['Updated Absent Days'] <= 156) or
-            (pd.notna(row['Year ']) and row['Year '] >= 2023 and row['Updated Absent Days'] <= 24) or
-            (pd.isna(row['Year ']) and row['Updated Absent Days'] <= 24)  # Handle missing 'Year'
-        ) else 'Defaulter',
-        axis=1
-    )
-
     # Visualization: Defaulter Chart
     st.subheader("Defaulter Visualization")
     fig2 = px.bar(
-        filtered_df,
+        for_px(filtered_agg),
         x='Name',
         y='Updated Absent Days',
         color='Defaulter',
@@ -214,12 +478,13 @@ if page_selection == "Main Dashboard":
     with col1:
         # Pie Chart for Transfer Case
         st.subheader("Transfer Case Distribution")
-        # For your transfer case pie chart, modify to:
-        transfer_counts = filtered_df['Transfer case '].value_counts().reset_index()
-        transfer_counts.columns = ['Transfer case', 'Count']  # Fixed column name (removed space)
-        
-        # Ensure we only have "Yes" and "No" values
-        transfer_counts = transfer_counts[transfer_counts['Transfer case'].isin(['Yes', 'No'])]
+        # Count only "Yes" and "No" values, straight from boolean reductions
+        transfer_col = filtered_df['Transfer case']
+        transfer_counts = pd.DataFrame({
+            'Transfer case': ['Yes', 'No'],
+            'Count': [transfer_col.eq('Yes').sum(), transfer_col.eq('No').sum()],
+        })
+        transfer_counts = transfer_counts[transfer_counts['Count'] > 0]
         
         fig_pie = px.pie(
             transfer_counts,
@@ -234,7 +499,7 @@ if page_selection == "Main Dashboard":
     
         # --- Display Names of Articles Under Each Transfer Case ---
         selected_transfer_case = st.radio("Select Transfer Case to View Articles", ["Yes", "No"], index=0)
-        articles_under_selected_case = filtered_df[filtered_df['Transfer case '] == selected_transfer_case]['Name'].unique()
+        articles_under_selected_case = filtered_df.loc[transfer_col.eq(selected_transfer_case), 'Name'].unique()
         
         st.subheader(f"Articles Under Transfer Case: {selected_transfer_case}")
         st.write(", ".join(articles_under_selected_case) if len(articles_under_selected_case) > 0 else "No articles found.")
@@ -244,20 +509,20 @@ if page_selection == "Main Dashboard":
                             # Funnel Chart for Extension Days
         st.subheader("Funnel Chart: Extension Days by Name")
 
-        # Filter out NaN values and include only rows where 'Extension Days' > 0
-        filtered_funnel_df = filtered_df.dropna(subset=['Extension Days '])
-        filtered_funnel_df = filtered_funnel_df[filtered_funnel_df['Extension Days '] > 0]
-
-        # Sort the DataFrame in descending order based on 'Extension Days '
-        filtered_funnel_df = filtered_funnel_df.sort_values(by='Extension Days ', ascending=False)
+        # Rows with 'Extension Days' > 0 are filtered and sorted once; just slice the selected article
+        ext_sorted = main_data['extensions']
+        if selected_article == "All":
+            filtered_funnel_df = ext_sorted
+        else:
+            filtered_funnel_df = ext_sorted[ext_sorted['Name'].eq(selected_article)]
 
         if not filtered_funnel_df.empty:
             fig_funnel = px.funnel(
-                filtered_funnel_df,
+                for_px(filtered_funnel_df),
                 y='Name',
-                x='Extension Days ',
+                x='Extension Days',
                 title="Extension Days Funnel Chart by Name",
-                labels={'Name': 'Article Name', 'Extension Days ': 'Extension Days '},
+                labels={'Name': 'Article Name', 'Extension Days': 'Extension Days'},
                 color_discrete_sequence=['PapayaWhip']  # Set the color to PapayaWhip
             )
             st.plotly_chart(fig_funnel, use_container_width=True)
@@ -268,22 +533,11 @@ if page_selection == "Main Dashboard":
 
     # Table with Excel-Like Filters (Using AgGrid)
     st.subheader("Detailed Table")
-    gb = GridOptionsBuilder.from_dataframe(filtered_df)
-    gb.configure_grid_options(domLayout='normal')  # Enable normal scrolling instead of pagination
-    gb.configure_side_bar()  # Add a sidebar to configure columns and filters
-    gb.configure_default_column(
-        filter=True,  # Enable filters
-        sortable=True,  # Enable sorting
-        resizable=True,  # Allow column resizing
-        editable=False  # Make the table non-editable
-    )
-    
-    grid_options = gb.build()
-
     AgGrid(
         filtered_df,
-        gridOptions=grid_options,
-        enable_enterprise_modules=True,  # Enable advanced features
+        gridOptions=build_grid_options(filtered_df),
+        update_mode=GridUpdateMode.NO_UPDATE,  # The table is display-only
+        enable_enterprise_modules=False,  # Community build only
         theme="streamlit"  # Use the Streamlit theme for AgGrid
     )
 
@@ -293,35 +547,29 @@ if page_selection == "Main Dashboard":
     """)
 
 if page_selection == "Monthly Data":
-    # Monthly Data Section
-    worksheet_monthly = spreadsheet.worksheet("pdftosheet")
-    data_monthly = worksheet_monthly.get_all_records()
-    df_monthly = pd.DataFrame(data_monthly)
-
-    # Ensure numeric columns are numeric
-    numeric_cols = ['Payable Days', 'Absent Days', 'Days in Month', 'Salary']
-    for col in numeric_cols:
-        df_monthly[col] = pd.to_numeric(df_monthly[col], errors='coerce')
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from st_aggrid import AgGrid, GridUpdateMode
 
+    # Monthly Data Section
     # Dropdown for month selection
     st.sidebar.title("Monthly Data Filter")
-    month_list = ["All"] + sorted(df_monthly['Month'].unique().tolist())
-    selected_month = st.sidebar.selectbox("Select Month", month_list)
+    selected_month = st.sidebar.selectbox("Select Month", opts['months'])
 
     # Filter based on selected month
     if selected_month == "All":
         filtered_monthly_df = df_monthly
     else:
-        filtered_monthly_df = df_monthly[df_monthly['Month'] == selected_month]
+        filtered_monthly_df = df_monthly.iloc[rows_for(main_data['month_rows'], selected_month)]
 
         # --- Stacked Bar Chart: Salary per Article by Month + Total Salary ---
     st.subheader("Stacked Salary Chart by Month with Total")
 
-    # Group salary by Name and Month
-    salary_stacked = df_monthly.groupby(['Name', 'Month'])['Salary'].sum().reset_index()
+    # Salary by Month and Name (cached for the loaded data)
+    salary_stacked = main_data['salary_by_month']
 
-    # Calculate total salary per article
-    total_salary = df_monthly.groupby('Name')['Salary'].sum().reset_index()
+    # Calculate total salary per article from the small pre-aggregated frame
+    total_salary = salary_stacked.groupby('Name', observed=True, as_index=False)['Salary'].sum()
     total_salary['Month'] = 'Total'  # Treat as another month for stacking
 
     # Combine original monthly salary with total
@@ -329,7 +577,7 @@ if page_selection == "Monthly Data":
 
     # Plot stacked bar chart including "Total"
     fig_combined = px.bar(
-        combined_salary,
+        for_px(combined_salary),
         x='Name',
         y='Salary',
         color='Month',
@@ -348,22 +596,25 @@ if page_selection == "Monthly Data":
     
     if selected_month == "All":
         # Salary trend over months (for "All" selection)
-        fig_salary_trend = px.line(
-            df_monthly.groupby(['Month', 'Name'])['Salary'].sum().reset_index(),
-            x='Month',
-            y='Salary',
-            color='Name',
-            markers=True,
-            labels={'Salary': 'Total Salary (₹)', 'Month': 'Month'},
-            title="Monthly Salary Trend by Article"
-        )
+        # One WebGL line per article, read column by column from the cached pivot
+        fig_salary_trend = go.Figure(layout=dict(title="Monthly Salary Trend by Article"))
+        salary_pivot = main_data['salary_pivot']
+        for name in salary_pivot.columns:
+            salary = salary_pivot[name].dropna()  # Months without a record for this article
+            fig_salary_trend.add_trace(go.Scattergl(
+                x=salary.index.to_numpy(),
+                y=typed_array(salary, dtype=np.float64),  # float32 would round large salaries
+                mode='lines+markers',
+                name=name
+            ))
+        fig_salary_trend.update_layout(xaxis_title='Month', yaxis_title='Total Salary (₹)', legend_title_text='Name')
         st.plotly_chart(fig_salary_trend, use_container_width=True)
         
     
     else:
         # Salary bar chart for individual month
         fig_salary = px.bar(
-            filtered_monthly_df,
+            for_px(filtered_monthly_df),
             x='Name',
             y='Salary',
             color='Name',
@@ -374,53 +625,50 @@ if page_selection == "Monthly Data":
 
     # --- Present/Absent Days Visualization (Existing Code) ---
     st.subheader(f"Present vs Absent Days for {selected_month if selected_month != 'All' else 'All Months'}")
-    present_absent_monthly_chart = filtered_monthly_df.groupby('Name')[['Payable Days', 'Absent Days']].sum().reset_index()
-    fig_monthly = px.bar(
-        present_absent_monthly_chart,
-        x='Name',
-        y=['Payable Days', 'Absent Days'],
-        barmode='group',
-        labels={'Name': 'Article Name', 'value': 'Days'},
-        color_discrete_map={'Payable Days': 'mediumpurple','Absent Days': 'papayawhip'},
-        title=f"Present vs Absent Days for {selected_month if selected_month != 'All' else 'All Months'}"
+    present_absent_monthly_chart = filtered_monthly_df.groupby('Name', observed=True)[['Payable Days', 'Absent Days']].sum().reset_index()
+    fig_monthly = grouped_bar_figure(
+        present_absent_monthly_chart['Name'],
+        [
+            ('Payable Days', present_absent_monthly_chart['Payable Days'], COLOR_MAP['Present']),
+            ('Absent Days', present_absent_monthly_chart['Absent Days'], COLOR_MAP['Absent']),
+        ],
+        title=f"Present vs Absent Days for {selected_month if selected_month != 'All' else 'All Months'}",
+        xaxis_title='Article Name',
+        yaxis_title='Days'
     )
-    fig_monthly.for_each_trace(lambda t: t.update(name='Payable Days' if 'Payable Days' in t.name else 'Absent Days'))
     st.plotly_chart(fig_monthly, use_container_width=True)
 
     # --- Detailed Table (Existing Code) ---
     st.subheader("Detailed Monthly Data Table")
-    gb_monthly = GridOptionsBuilder.from_dataframe(filtered_monthly_df)
-    gb_monthly.configure_grid_options(domLayout='normal')
-    gb_monthly.configure_side_bar()
-    gb_monthly.configure_default_column(filter=True, sortable=True, resizable=True, editable=False)
-    grid_options_monthly = gb_monthly.build()
-    AgGrid(filtered_monthly_df, gridOptions=grid_options_monthly, enable_enterprise_modules=True, theme="streamlit")
+    AgGrid(
+        filtered_monthly_df,
+        gridOptions=build_grid_options(filtered_monthly_df),
+        update_mode=GridUpdateMode.NO_UPDATE,
+        enable_enterprise_modules=False,  # Community build only
+        theme="streamlit"
+    )
 
 # Add this new condition for the Daily Dashboard
 elif page_selection == "Daily Dashboard":
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from st_aggrid import AgGrid, GridUpdateMode
+
     st.title("Daily Attendance Dashboard")
     
-    # Open the daily attendance Google Sheet
-    daily_sheet_key = "1J2XQPhOc2OqDcjjg_9-WLA7RbtveaLI5ddK91I6cwlw"
-    daily_spreadsheet = gc.open_by_key(daily_sheet_key)
-    
-    # Get all worksheet names except "Sheet1"
-    worksheets = daily_spreadsheet.worksheets()
-    available_sheets = [ws.title for ws in worksheets if ws.title != "Sheet1"]
+    # Load every month sheet of the daily attendance Google Sheet (all except "Sheet1")
+    daily_data = get_daily_frames(gc, DAILY_SHEET_KEY, get_sheet_revision(gc, DAILY_SHEET_KEY))
+    available_sheets = list(daily_data['frames'].keys())
     
     # Sidebar filters
     st.sidebar.title("Daily Data Filters")
     selected_sheet = st.sidebar.selectbox("Select Month Sheet", available_sheets)
     
-    # Load the selected worksheet
-    daily_worksheet = daily_spreadsheet.worksheet(selected_sheet)
-    daily_data = daily_worksheet.get_all_records()
-    daily_df = pd.DataFrame(daily_data)
+    # Pick the selected worksheet from the batch-loaded frames
+    daily_df = daily_data['frames'][selected_sheet]
     
-    # Convert date column to datetime for filtering
+    # Dates were parsed when the sheet was loaded
     if 'Date' in daily_df.columns:
-        daily_df['Date'] = pd.to_datetime(daily_df['Date'], errors='coerce', dayfirst=True)
-        
         # Date range selector
         min_date = daily_df['Date'].min()
         max_date = daily_df['Date'].max()
@@ -430,57 +678,22 @@ elif page_selection == "Daily Dashboard":
             min_value=min_date,
             max_value=max_date
         )
-        
-        # Filter by date range
-        if len(date_range) == 2:
-            start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-            daily_df = daily_df[(daily_df['Date'] >= start_date) & (daily_df['Date'] <= end_date)]
     
     # Staff name filter
-    staff_names = ["All"] + sorted(daily_df['Staff Name'].unique().tolist())
+    staff_names = ["All"] + daily_df['Staff Name'].cat.categories.tolist()
     selected_staff = st.sidebar.selectbox("Select Staff Member", staff_names)
     
+    # Filter by staff member first: the row positions refer to the full sheet
     if selected_staff != "All":
-        daily_df = daily_df[daily_df['Staff Name'] == selected_staff]
+        daily_df = daily_df.iloc[rows_for(daily_data['staff_rows'][selected_sheet], selected_staff)]
     
-    # Clean and process Hours Worked column - convert to numeric hours
-    if 'Hours Worked' in daily_df.columns:
-        def convert_to_hours(hours_str):
-            if pd.isna(hours_str):
-                return 0.0
-            
-            # If it's already a number, return it directly
-            try:
-                return float(hours_str)
-            except:
-                pass
-                
-            # Handle time strings (HH:MM:SS)
-            if isinstance(hours_str, str):
-                # Remove any extra characters or multiple time entries
-                clean_str = hours_str.split()[0]  # Take first part if multiple times
-                
-                # Handle HH:MM:SS format
-                if clean_str.count(':') == 2:
-                    try:
-                        h, m, s = map(float, clean_str.split(':'))
-                        return h + m/60 + s/3600
-                    except:
-                        pass
-                
-                # Handle HH:MM format
-                elif clean_str.count(':') == 1:
-                    try:
-                        h, m = map(float, clean_str.split(':'))
-                        return h + m/60
-                    except:
-                        pass
-            
-            # If all else fails, return 0
-            return 0.0
-        
-        daily_df['Hours Worked'] = daily_df['Hours Worked'].apply(convert_to_hours)
-        daily_df['Hours Worked'] = pd.to_numeric(daily_df['Hours Worked'], errors='coerce').fillna(0)
+    # Filter by date range: Date is sorted, so the range is a binary-searched slice
+    if 'Date' in daily_df.columns and len(date_range) == 2:
+        start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
+        date_arr = daily_df['Date'].to_numpy()
+        lo = np.searchsorted(date_arr, start_date.to_datetime64(), side='left')
+        hi = np.searchsorted(date_arr, end_date.to_datetime64(), side='right')
+        daily_df = daily_df.iloc[lo:hi]
     
     # Display KPIs
     st.subheader("Daily Attendance Summary")
@@ -504,24 +717,15 @@ elif page_selection == "Daily Dashboard":
     # Format Hours Worked for display (optional)
     if 'Hours Worked' in display_df.columns:
         display_df['Hours Worked Display'] = display_df['Hours Worked'].apply(
-            lambda x: f"{int(x)}:{int((x % 1) * 60):02d}" if pd.notna(x) else "--"
+            # Round to whole minutes first so e.g. 8:20 (8.333...) doesn't truncate to 8:19
+            lambda x: f"{int(round(x * 60)) // 60}:{int(round(x * 60)) % 60:02d}" if pd.notna(x) else "--"
         )
     
-    gb_daily = GridOptionsBuilder.from_dataframe(display_df)
-    gb_daily.configure_grid_options(domLayout='normal')
-    gb_daily.configure_side_bar()
-    gb_daily.configure_default_column(
-        filter=True, 
-        sortable=True, 
-        resizable=True, 
-        editable=False
-    )
-    grid_options_daily = gb_daily.build()
-    
     AgGrid(
         display_df,
-        gridOptions=grid_options_daily,
-        enable_enterprise_modules=True,
+        gridOptions=build_grid_options(display_df),
+        update_mode=GridUpdateMode.NO_UPDATE,  # Don't round-trip grid state on scroll/filter
+        enable_enterprise_modules=False,  # Community build only
         theme="streamlit",
         height=500,
         width='100%'
@@ -532,9 +736,10 @@ elif page_selection == "Daily Dashboard":
         st.subheader("Attendance Status Distribution")
         status_counts = daily_df['Attendance'].value_counts().reset_index()
         status_counts.columns = ['Status', 'Count']
+        status_counts = status_counts[status_counts['Count'] > 0]  # Drop unobserved categories
         
         fig = px.pie(
-            status_counts,
+            for_px(status_counts),
             names='Status',
             values='Count',
             title="Attendance Status Distribution",
@@ -546,15 +751,20 @@ elif page_selection == "Daily Dashboard":
     if 'Hours Worked' in daily_df.columns and 'Date' in daily_df.columns:
         st.subheader("Hours Worked Trend Over Time")
         try:
-            fig = px.line(
-                daily_df,
-                x='Date',
-                y='Hours Worked',
-                color='Staff Name' if selected_staff == "All" else None,
-                title="Daily Hours Worked Trend",
-                markers=True,
-                labels={'Hours Worked': 'Hours Worked'}
-            )
+            # WebGL (Scattergl) traces, one per staff member, for dense daily data
+            if selected_staff == "All":
+                staff_groups = daily_df.groupby('Staff Name', observed=True)
+            else:
+                staff_groups = [(selected_staff, daily_df)]
+            fig = go.Figure(layout=dict(title="Daily Hours Worked Trend"))
+            for staff, group in staff_groups:
+                fig.add_trace(go.Scattergl(
+                    x=group['Date'].to_numpy(),
+                    y=typed_array(group['Hours Worked']),
+                    mode='lines+markers',
+                    name=staff
+                ))
+            fig.update_layout(xaxis_title='Date', yaxis_title='Hours Worked', legend_title_text='Staff Name')
             
             # Set y-axis range to start from 0
             fig.update_yaxes(rangemode="tozero")